@@ -405,7 +405,7 @@ from mybot import (
 )
 
 # Import TON payment system
-from ton_payments import ton_payment
+from ton_payments import ton_payment, rate_limits, failed_attempts
 from security_2fa import two_fa
 
 # TON payment commands
@@ -573,7 +573,7 @@ async def show_monitoring_status(update: types.Update, context: types.ContextTyp
     try:
         # Get current monitoring status
         status = {
-            'monitoring_thread': 'Running' if monitoring_thread.is_alive() else 'Stopped',
+            'monitoring_thread': 'Running' if ton_payment.is_monitor_running() else 'Stopped',
             'rate_limits': len(rate_limits),
             'failed_attempts': len(failed_attempts),
             'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -765,12 +765,17 @@ async def main():
         dp.message.register(setup_2fa, Command('setup2fa'))
         dp.message.register(check_2fa, Command('check2fa'))
         
+        # Start payment monitoring
+        await ton_payment.start_monitor()
+        
         # Start the bot
         await dp.start_polling(bot)
         
     except Exception as e:
         logger.error(f"Bot startup error: {str(e)}")
         raise
+    finally:
+        await ton_payment.close()
 
 if __name__ == '__main__':
     try:
@@ -1,9 +1,33 @@
 import sqlite3
 import os
+from security import hash_password
 
-def migrate_database():
-    """Migrate database schema to add agreement_accepted field."""
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db')
+def migrate_payment_timestamps(db_path: str):
+    """Convert payment timestamps stored as local-time ISO text to unix seconds."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'payments'")
+        if cursor.fetchone()[0]:
+            for column in ('created_at', 'expires_at'):
+                cursor.execute(f'''
+                    UPDATE payments 
+                    SET {column} = CAST(strftime('%s', {column}, 'utc') AS INTEGER) 
+                    WHERE typeof({column}) = 'text'
+                ''')
+            conn.commit()
+            print("Converted payment timestamps to unix seconds.")
+    except sqlite3.Error as e:
+        print(f"Error during payment timestamp migration: {str(e)}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+def migrate_database(db_path: str = None):
+    """Migrate database schema to add agreement_accepted and password_hash fields."""
+    if db_path is None:
+        db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db')
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
@@ -31,12 +55,42 @@ def migrate_database():
             print("Database migration completed successfully!")
         else:
             print("Database is already up to date.")
+        
+        # Add password_hash column and hash any plaintext passwords
+        cursor.execute('''
+            SELECT COUNT(*) 
+            FROM pragma_table_info('users') 
+            WHERE name = 'password_hash'
+        ''')
+        
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('''
+                ALTER TABLE users 
+                ADD COLUMN password_hash TEXT
+            ''')
+        
+        cursor.execute('''
+            SELECT rowid, password 
+            FROM users 
+            WHERE password_hash IS NULL AND password IS NOT NULL AND password != ''
+        ''')
+        rows = cursor.fetchall()
+        cursor.executemany('''
+            UPDATE users 
+            SET password_hash = ?, password = '' 
+            WHERE rowid = ?
+        ''', [(hash_password(password), rowid) for rowid, password in rows])
+        
+        conn.commit()
+        print(f"Hashed {len(rows)} plaintext passwords.")
             
     except sqlite3.Error as e:
         print(f"Error during database migration: {str(e)}")
         conn.rollback()
     finally:
         conn.close()
+    
+    migrate_payment_timestamps(db_path)
 
 if __name__ == '__main__':
     migrate_database()
@@ -3,7 +3,8 @@ CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     telegram_id INTEGER UNIQUE NOT NULL,
     username TEXT NOT NULL,
-    password TEXT NOT NULL,
+    password TEXT NOT NULL DEFAULT '',
+    password_hash TEXT NOT NULL,
     gpt_username TEXT NOT NULL,
     gpt_password TEXT NOT NULL,
     points INTEGER DEFAULT 0,
@@ -13,6 +14,9 @@ CREATE TABLE IF NOT EXISTS users (
     is_admin BOOLEAN DEFAULT FALSE
 );
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id);
+
 -- Registration attempts table
 CREATE TABLE IF NOT EXISTS registration_attempts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,6 +28,8 @@ CREATE TABLE IF NOT EXISTS registration_attempts (
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
 
+CREATE INDEX IF NOT EXISTS idx_attempts_user_ts ON registration_attempts(user_id, attempt_timestamp);
+
 -- User analytics table
 CREATE TABLE IF NOT EXISTS user_analytics (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -0,0 +1,59 @@
+import os
+import queue
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Shared bot database
+DB_PATH = os.getenv('BOT_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db'))
+POOL_SIZE = 8
+# Callers pass module-level SQL constants, so repeated queries hit this cache
+STATEMENT_CACHE_SIZE = 128
+
+# Lookup indexes for the login and registration hot paths
+_INDEXES = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id)',
+    'CREATE INDEX IF NOT EXISTS idx_attempts_user_ts ON registration_attempts(user_id, attempt_timestamp)'
+]
+
+def _create_connection() -> sqlite3.Connection:
+    """Open a pooled connection in autocommit mode with WAL enabled."""
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-8000')
+    return conn
+
+
+_pool = queue.Queue(maxsize=POOL_SIZE)
+for _ in range(POOL_SIZE):
+    _pool.put(_create_connection())
+
+@contextmanager
+def borrow_conn():
+    """Borrow a connection from the pool for the duration of a with block."""
+    conn = _pool.get()
+    try:
+        yield conn
+    finally:
+        # Never hand an open transaction to the next borrower
+        if conn.in_transaction:
+            conn.rollback()
+        _pool.put(conn)
+
+def ensure_indexes():
+    """Create lookup indexes; call once the tables they cover exist."""
+    with borrow_conn() as conn:
+        for statement in _INDEXES:
+            try:
+                conn.execute(statement)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not create index: {str(e)}")
@@ -22,7 +22,7 @@ from config_manager import config_manager
 
 # Import modules
 from database import db
-from user_registration import get_registration_handlers
+from user_registration import get_registration_handlers, flush_attempts
 from user_login import get_login_handlers
 from user_credentials import get_credentials_handlers
 from gpt_platform import GPTPlatform
@@ -801,7 +801,7 @@ def main():
         
         # Create bot application
         print("Creating bot application...")
-        app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+        app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_shutdown(flush_attempts).build()
         print("Bot application created")
         
         # Initialize TON client
@@ -840,7 +840,7 @@ client = TonClient(config=client_config)
 
 # --- Initialize bot ---
 if __name__ == '__main__':
-    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_shutdown(flush_attempts).build()
 
     # Add user management handlers
     application.add_handler(get_registration_handlers())
@@ -904,7 +904,7 @@ async def main():
         client = TonClient(config=client_config)
         
         # Initialize application
-        application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+        application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_shutdown(flush_attempts).build()
         
         # Register handlers
         application.add_handler(CommandHandler('start', start))
@@ -1,10 +1,23 @@
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+from datetime import timedelta
+import sqlite3
 import time
 import logging
+from db_pool import borrow_conn
 
 logger = logging.getLogger(__name__)
 
+ATTEMPT_COOLDOWN = timedelta(minutes=5)
+
+# Attempts in the last hour plus seconds since the latest one, in one pass
+_Q_RATE_STATE = '''
+    SELECT COUNT(*), 
+           CAST(strftime('%s', 'now') - strftime('%s', MAX(attempt_timestamp)) AS INTEGER)
+    FROM registration_attempts 
+    WHERE user_id = ? AND step = ? 
+    AND attempt_timestamp >= datetime('now', '-1 hour')
+'''
+
 class RegistrationHelper:
     def __init__(self):
         self.attempt_limits = {
@@ -14,61 +27,19 @@ class RegistrationHelper:
             'confirmation': 2
         }
         
-    def get_time_remaining(self, user_id: int, step: str) -> Optional[timedelta]:
-        """Get time remaining until next attempt."""
-        conn = sqlite3.connect('botdata.db')
-        cursor = conn.cursor()
-        
+    def fetch_rate_state(self, user_id: int, step: str) -> Tuple[int, Optional[timedelta]]:
+        """Get remaining attempts and cooldown left for a step with a single query."""
         try:
-            cursor.execute('''
-                SELECT attempt_timestamp 
-                FROM registration_attempts 
-                WHERE user_id = ? AND step = ? 
-                ORDER BY attempt_timestamp DESC 
-                LIMIT 1
-            ''', (user_id, step))
-            
-            last_attempt = cursor.fetchone()
-            if not last_attempt:
-                return None
-                
-            last_time = datetime.strptime(last_attempt[0], '%Y-%m-%d %H:%M:%S')
-            cooldown = timedelta(minutes=5)
-            
-            if datetime.now() - last_time < cooldown:
-                return cooldown - (datetime.now() - last_time)
-                
-            return None
-            
+            with borrow_conn() as conn:
+                attempts, elapsed = conn.execute(_Q_RATE_STATE, (user_id, step)).fetchone()
         except sqlite3.Error as e:
-            logger.error(f"Error getting time remaining: {str(e)}")
-            return None
+            logger.error(f"Error getting rate state: {str(e)}")
+            return 0, None
             
-        finally:
-            conn.close()
-
-    def get_remaining_attempts(self, user_id: int, step: str) -> int:
-        """Get remaining attempts for a step."""
-        conn = sqlite3.connect('botdata.db')
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                SELECT COUNT(*) 
-                FROM registration_attempts 
-                WHERE user_id = ? AND step = ? 
-                AND attempt_timestamp >= datetime('now', '-1 hour')
-            ''', (user_id, step))
-            
-            attempts = cursor.fetchone()[0]
-            return max(0, self.attempt_limits.get(step, 3) - attempts)
-            
-        except sqlite3.Error as e:
-            logger.error(f"Error getting remaining attempts: {str(e)}")
-            return 0
-            
-        finally:
-            conn.close()
+        remaining = max(0, self.attempt_limits.get(step, 3) - attempts)
+        if elapsed is None or elapsed >= ATTEMPT_COOLDOWN.total_seconds():
+            return remaining, None
+        return remaining, ATTEMPT_COOLDOWN - timedelta(seconds=elapsed)
 
     def format_validation_report(self, validation_result: Dict[str, Any]) -> str:
         """Format validation report for display."""
@@ -119,17 +90,13 @@ class RegistrationHelper:
             
         return "\n".join(progress)
 
-    def format_error_message(self, error_type: str, error_message: str, step: str) -> str:
-        """Format error message with remaining attempts."""
-        remaining = self.get_remaining_attempts(step)
-        time_remaining = self.get_time_remaining(step)
-        
-        if time_remaining:
-            minutes = int(time_remaining.total_seconds() // 60)
-            seconds = int(time_remaining.total_seconds() % 60)
-            cooldown_message = f"\nPlease wait {minutes} minutes and {seconds} seconds before trying again."
-        else:
-            cooldown_message = ""
+    def format_error_message(self, error_message: str, remaining: int) -> str:
+        """Format error message from the rate state read before this attempt."""
+        # The attempt being reported counts against the limit and restarts the cooldown
+        remaining = max(remaining - 1, 0)
+        minutes = int(ATTEMPT_COOLDOWN.total_seconds() // 60)
+        seconds = int(ATTEMPT_COOLDOWN.total_seconds() % 60)
+        cooldown_message = f"\nPlease wait {minutes} minutes and {seconds} seconds before trying again."
             
         return f"❌ {error_message}\n\n" \
                f"Remaining attempts: {remaining}\n" \
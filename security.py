@@ -4,12 +4,43 @@ from typing import Optional, Dict, Any
 import sqlite3
 from datetime import datetime, timedelta
 import hashlib
+import hmac
 import secrets
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PBKDF2_ITERATIONS = 100000
+
+def hash_password(password: str) -> str:
+    """Securely hash password using PBKDF2 with SHA-256."""
+    salt = secrets.token_hex(16)
+    key = hashlib.pbkdf2_hmac(
+        'sha256',
+        password.encode('utf-8'),
+        salt.encode('utf-8'),
+        PBKDF2_ITERATIONS
+    )
+    return f"{salt}${key.hex()}"
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Verify password against hashed value in constant time."""
+    if not hashed:
+        return False
+    try:
+        salt, key = hashed.split('$')
+        calculated_key = hashlib.pbkdf2_hmac(
+            'sha256',
+            password.encode('utf-8'),
+            salt.encode('utf-8'),
+            PBKDF2_ITERATIONS
+        )
+        return hmac.compare_digest(calculated_key.hex(), key)
+    except (ValueError, IndexError) as e:
+        logger.error(f"Password verification error: {str(e)}")
+        return False
+
 class SecurityManager:
     def __init__(self, db_path: str):
         self.db_path = db_path
@@ -171,29 +202,11 @@ class SecurityManager:
 
     def hash_password(self, password: str) -> str:
         """Securely hash password using PBKDF2 with SHA-256."""
-        salt = secrets.token_hex(16)
-        key = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            salt.encode('utf-8'),
-            100000
-        )
-        return f"{salt}${key.hex()}"
+        return hash_password(password)
 
     def verify_password(self, password: str, hashed: str) -> bool:
         """Verify password against hashed value."""
-        try:
-            salt, key = hashed.split('$')
-            calculated_key = hashlib.pbkdf2_hmac(
-                'sha256',
-                password.encode('utf-8'),
-                salt.encode('utf-8'),
-                100000
-            )
-            return calculated_key.hex() == key
-        except (ValueError, IndexError) as e:
-            logger.error(f"Password verification error: {str(e)}")
-            return False
+        return verify_password(password, hashed)
 
     def get_user_ip(self, update: Any) -> Optional[str]:
         """Get user's IP address from update."""
@@ -0,0 +1,87 @@
+import os
+import sys
+import sqlite3
+import importlib
+from datetime import timedelta
+import pytest
+
+TEST_USER_ID = 123456789
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database_schema.sql')
+
+@pytest.fixture(scope="module")
+def registration(tmp_path_factory):
+    """Import the registration modules against a temporary database."""
+    db_path = str(tmp_path_factory.mktemp("registration") / "bot.db")
+    conn = sqlite3.connect(db_path)
+    with open(SCHEMA_PATH) as schema:
+        conn.executescript(schema.read())
+    conn.close()
+    os.environ['BOT_DB_PATH'] = db_path
+    for name in ('db_pool', 'registration_helpers', 'user_registration'):
+        sys.modules.pop(name, None)
+    module = importlib.import_module('user_registration')
+    yield module
+    os.environ.pop('BOT_DB_PATH', None)
+    for name in ('db_pool', 'registration_helpers', 'user_registration'):
+        sys.modules.pop(name, None)
+
+def run(registration, query, params=()):
+    """Execute a statement on the temporary database."""
+    with registration.borrow_conn() as conn:
+        conn.execute(query, params)
+
+def add_attempt(registration, user_id, step, age):
+    """Record an attempt made the given number of seconds ago."""
+    run(registration, '''
+        INSERT INTO registration_attempts (user_id, step, attempt_timestamp)
+        VALUES (?, ?, datetime('now', ?))
+    ''', (user_id, step, f'-{age} seconds'))
+
+def add_user(registration, telegram_id, agreement_accepted):
+    """Insert a registered user."""
+    run(registration, '''
+        INSERT INTO users (telegram_id, username, password_hash, gpt_username, 
+                           gpt_password, agreement_accepted)
+        VALUES (?, ?, 'hash', 'gpt', 'gpt', ?)
+    ''', (telegram_id, f"user{telegram_id}", agreement_accepted))
+
+def test_rate_state_without_attempts(registration):
+    """Test that a user with no attempts gets the full limit and no cooldown."""
+    helper = registration.helper
+    assert helper.fetch_rate_state(TEST_USER_ID, 'username') == (helper.attempt_limits['username'], None)
+
+def test_rate_state_after_recent_attempt(registration):
+    """Test that a recent attempt uses up one attempt and starts the cooldown."""
+    helper = registration.helper
+    add_attempt(registration, TEST_USER_ID + 1, 'password', 60)
+    remaining, time_remaining = helper.fetch_rate_state(TEST_USER_ID + 1, 'password')
+    assert remaining == helper.attempt_limits['password'] - 1
+    assert timedelta(0) < time_remaining < timedelta(minutes=5)
+
+def test_rate_state_after_cooldown(registration):
+    """Test that an attempt older than the cooldown counts but no longer blocks."""
+    helper = registration.helper
+    add_attempt(registration, TEST_USER_ID + 2, 'password', 600)
+    remaining, time_remaining = helper.fetch_rate_state(TEST_USER_ID + 2, 'password')
+    assert remaining == helper.attempt_limits['password'] - 1
+    assert time_remaining is None
+
+def test_start_state_unknown_user(registration):
+    """Test that an unknown user has no attempts, id or agreement."""
+    assert registration._fetch_start_state(TEST_USER_ID + 3) == (0, None, None)
+
+def test_start_state_unaccepted_user(registration):
+    """Test that a user who has not accepted the agreement is reported as such."""
+    add_user(registration, TEST_USER_ID + 4, 0)
+    attempts, user_id, agreement_accepted = registration._fetch_start_state(TEST_USER_ID + 4)
+    assert attempts == 0
+    assert user_id is not None
+    assert agreement_accepted == 0
+
+def test_start_state_accepted_user(registration):
+    """Test that an accepted user is reported with the agreement flag set."""
+    add_user(registration, TEST_USER_ID + 5, 1)
+    attempts, user_id, agreement_accepted = registration._fetch_start_state(TEST_USER_ID + 5)
+    assert attempts == 0
+    assert user_id is not None
+    assert agreement_accepted == 1
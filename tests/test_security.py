@@ -1,9 +1,12 @@
 import os
+import sqlite3
+from datetime import datetime
 import pytest
 import asyncio
 from bot import bot, dp
 from bonus_system import BonusSystem
-from security import SecurityManager
+from security import SecurityManager, hash_password, verify_password
+from database_migration import migrate_database
 
 # Configure test settings
 TEST_USER_ID = 123456789
@@ -109,5 +112,92 @@ async def test_error_handling():
     except Exception as e:
         assert "Error processing update" in str(e)
 
+def test_password_hash_round_trip():
+    """Test that a hashed password verifies."""
+    hashed = hash_password("Correct-Horse-1")
+    assert "Correct-Horse-1" not in hashed
+    assert verify_password("Correct-Horse-1", hashed)
+
+def test_password_hash_is_salted():
+    """Test that hashing the same password twice gives different hashes."""
+    assert hash_password("Correct-Horse-1") != hash_password("Correct-Horse-1")
+
+def test_wrong_password_rejected():
+    """Test that a wrong password does not verify."""
+    hashed = hash_password("Correct-Horse-1")
+    assert not verify_password("correct-horse-1", hashed)
+    assert not verify_password("", hashed)
+
+def test_empty_or_malformed_hash_rejected():
+    """Test that missing or malformed hashes never verify."""
+    assert not verify_password("anything", "")
+    assert not verify_password("anything", None)
+    assert not verify_password("anything", "not-a-hash")
+
+def test_migration_hashes_plaintext_passwords(tmp_path):
+    """Test that migration hashes plaintext passwords and blanks the column."""
+    db_path = str(tmp_path / "migrate.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY,
+            telegram_id INTEGER UNIQUE,
+            username TEXT,
+            password TEXT
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO users (telegram_id, username, password)
+        VALUES (?, ?, ?)
+    ''', (TEST_USER_ID, "testuser", "Plaintext-1"))
+    conn.commit()
+    conn.close()
+
+    migrate_database(db_path)
+
+    conn = sqlite3.connect(db_path)
+    password, password_hash = conn.execute(
+        'SELECT password, password_hash FROM users WHERE telegram_id = ?', (TEST_USER_ID,)
+    ).fetchone()
+    conn.close()
+    assert password == ''
+    assert verify_password("Plaintext-1", password_hash)
+    assert not verify_password("Plaintext-2", password_hash)
+
+def test_migration_converts_payment_timestamps(tmp_path):
+    """Test that payment timestamps are converted even when the users step fails."""
+    db_path = str(tmp_path / "migrate.db")
+    created_at = datetime.now()
+    conn = sqlite3.connect(db_path)
+    # No password column, as in mybot.py, so the password-hash step errors out
+    conn.execute('''
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY,
+            telegram_id INTEGER UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE payments (
+            payment_id TEXT PRIMARY KEY,
+            created_at TIMESTAMP,
+            expires_at TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO payments (payment_id, created_at, expires_at)
+        VALUES (?, ?, ?)
+    ''', ("pay_1", created_at.isoformat(sep=' '), created_at.isoformat(sep=' ')))
+    conn.commit()
+    conn.close()
+
+    migrate_database(db_path)
+
+    conn = sqlite3.connect(db_path)
+    row = conn.execute(
+        'SELECT created_at, expires_at FROM payments WHERE payment_id = ?', ("pay_1",)
+    ).fetchone()
+    conn.close()
+    assert row == (int(created_at.timestamp()), int(created_at.timestamp()))
+
 if __name__ == "__main__":
     pytest.main()
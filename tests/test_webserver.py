@@ -0,0 +1,72 @@
+import os
+import sys
+import sqlite3
+import importlib
+import threading
+import pytest
+
+TEST_USER_ID = 123456789
+
+@pytest.fixture(scope="module")
+def webserver(tmp_path_factory):
+    """Import the web app against a temporary database."""
+    os.environ['WEBSERVER_DB_PATH'] = str(tmp_path_factory.mktemp("web") / "web.db")
+    sys.modules.pop('webserver', None)
+    module = importlib.import_module('webserver')
+    yield module
+    os.environ.pop('WEBSERVER_DB_PATH', None)
+
+def stored_credits(webserver, user_id):
+    """Read a user's credits straight from the database."""
+    conn = sqlite3.connect(webserver.DB_PATH)
+    try:
+        return conn.execute('SELECT credits FROM users WHERE user_id = ?', (user_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def test_concurrent_watched_calls_sum(webserver):
+    """Test that concurrent completions for one user are all credited."""
+    responses = []
+    lock = threading.Lock()
+
+    def watch():
+        response = webserver.app.test_client().get(f'/watched?user_id={TEST_USER_ID}')
+        with lock:
+            responses.append(response)
+
+    threads = [threading.Thread(target=watch) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(response.status_code == 200 for response in responses)
+    expected = 20 * webserver.CREDITS_PER_VIDEO
+    assert stored_credits(webserver, TEST_USER_ID) == pytest.approx(expected)
+    assert max(response.get_json()['new_credits'] for response in responses) == pytest.approx(expected)
+
+def test_watched_returns_stored_balance(webserver):
+    """Test that new_credits matches the balance in the database."""
+    response = webserver.app.test_client().get('/watched?user_id=42')
+    assert response.status_code == 200
+    assert response.get_json()['new_credits'] == stored_credits(webserver, 42)
+
+@pytest.mark.parametrize("user_id", ["", "abc", "0", "-5", "100000000000000000000"])
+def test_watched_rejects_bad_ids(webserver, user_id):
+    """Test that missing, malformed and out-of-range ids get a 400."""
+    response = webserver.app.test_client().get(f'/watched?user_id={user_id}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'User ID required'}
+
+def test_flusher_survives_failed_batch(webserver):
+    """Test that a batch the database cannot store does not stop later flushes."""
+    batch = webserver.queue_credits(10**20, webserver.CREDITS_PER_VIDEO)
+    assert batch.done.wait(webserver.CREDIT_FLUSH_TIMEOUT)
+    assert 10**20 not in batch.balances
+
+    response = webserver.app.test_client().get('/watched?user_id=43')
+    assert response.status_code == 200
+    assert response.get_json()['new_credits'] == stored_credits(webserver, 43)
+
+if __name__ == "__main__":
+    pytest.main()
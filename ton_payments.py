@@ -1,6 +1,7 @@
 import os
 import logging
 import asyncio
+import sqlite3
 from typing import Optional, Dict, Any, List
 import hashlib
 import hmac
@@ -10,7 +11,8 @@ import json
 import aiohttp
 from aiogram import types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from collections import defaultdict
+from collections import defaultdict, Counter
+from dataclasses import dataclass
 import threading
 import schedule
 
@@ -21,77 +23,147 @@ logger = logging.getLogger(__name__)
 # Analytics and monitoring
 ANALYTICS_INTERVAL = 300  # 5 minutes
 MAX_FAILED_ATTEMPTS = 3
+MAX_REQUESTS_PER_MINUTE = 60
 RATE_LIMIT_WINDOW = 3600  # 1 hour
 
 # Payment analytics
-payment_analytics = {
-    'total_payments': 0,
-    'successful_payments': 0,
-    'failed_payments': 0,
-    'total_amount': 0.0,
-    'average_amount': 0.0,
-    'daily_stats': defaultdict(int),
-    'payment_methods': defaultdict(int)
-}
+@dataclass
+class PaymentMetrics:
+    total_payments: int = 0
+    successful_payments: int = 0
+    failed_payments: int = 0
+    total_amount: float = 0.0
+    average_amount: float = 0.0
+
+# Replaced wholesale by the monitor; readers take the reference once
+payment_analytics = PaymentMetrics()
+
+# Counters shared across threads, guarded by stats_lock
+daily_stats: Counter = Counter()
+payment_methods: Counter = Counter()
+stats_lock = threading.Lock()
 
 # Rate limiting
 rate_limits = defaultdict(int)
 failed_attempts = defaultdict(int)
+banned_until: Dict[int, float] = {}
+
+# TON API configuration
+TON_API_URL = "https://api.ton.org/v1"
+TON_WALLET = os.getenv('TON_WALLET_ADDRESS')
+TON_API_KEY = os.getenv('TON_API_KEY')
+
+# Payment constants
+MIN_PAYMENT_AMOUNT = 0.1  # Minimum payment in TON
+PAYMENT_TIMEOUT = 300  # 5 minutes in seconds
+
+# Payment status
+PAYMENT_STATUS = {
+    'pending': '⏳ Pending',
+    'confirmed': '✅ Confirmed',
+    'expired': '❌ Expired',
+    'failed': '❌ Failed'
+}
 
-# Monitoring thread
-class MonitoringThread(threading.Thread):
+class TONPayment:
     def __init__(self, db_path: str):
-        super().__init__()
         self.db_path = db_path
-        self.daemon = True
+        self.initialize_db()
+        
+        # Read-only connection for lookups; never takes the write lock
+        self._ro_conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=False)
+        self._ro_conn.execute('PRAGMA mmap_size=268435456')
+        self._ro_conn.row_factory = sqlite3.Row
+        # HTTP session is created on first use so it binds to the running loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on the running event loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    limit_per_host=32,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60
+                ),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self._session
+
+    async def close(self):
+        """Stop the monitoring task and close the HTTP session."""
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
-    def run(self):
+    async def start_monitor(self):
+        """Start the background monitoring task on the running event loop."""
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._monitor_loop())
+
+    def is_monitor_running(self) -> bool:
+        """Check whether the monitoring task is active."""
+        return self._monitor_task is not None and not self._monitor_task.done()
+
+    async def _monitor_loop(self):
         while True:
             try:
                 # Update analytics
-                self.update_analytics()
+                await asyncio.to_thread(self._sync_update_analytics)
                 
                 # Check for suspicious activity
-                self.check_suspicious_activity()
+                self._sweep_rate_limits()
                 
                 # Clean up old data
-                self.cleanup_old_data()
+                await asyncio.to_thread(self._sync_cleanup_old_data)
                 
             except Exception as e:
                 logger.error(f"Monitoring error: {str(e)}")
             
-            time.sleep(ANALYTICS_INTERVAL)
+            await asyncio.sleep(ANALYTICS_INTERVAL)
 
-    def update_analytics(self):
+    def _sync_update_analytics(self):
+        global payment_analytics
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         # Update payment statistics
+        metrics = PaymentMetrics()
         cursor.execute('SELECT COUNT(*), SUM(amount) FROM payments')
         total, total_amount = cursor.fetchone()
-        payment_analytics['total_payments'] = total
-        payment_analytics['total_amount'] = total_amount or 0
+        metrics.total_payments = total
+        metrics.total_amount = total_amount or 0
         
         cursor.execute('SELECT COUNT(*) FROM payments WHERE status = ?', ('confirmed',))
-        payment_analytics['successful_payments'] = cursor.fetchone()[0]
+        metrics.successful_payments = cursor.fetchone()[0]
         
         cursor.execute('SELECT COUNT(*) FROM payments WHERE status = ?', ('failed',))
-        payment_analytics['failed_payments'] = cursor.fetchone()[0]
+        metrics.failed_payments = cursor.fetchone()[0]
         
         if total > 0:
-            payment_analytics['average_amount'] = total_amount / total
+            metrics.average_amount = total_amount / total
+        
+        conn.close()
+        
+        # Publish the new snapshot with a single reference swap
+        payment_analytics = metrics
         
         # Update daily stats
         today = datetime.now().strftime('%Y-%m-%d')
-        payment_analytics['daily_stats'][today] += 1
-        
-        conn.close()
+        with stats_lock:
+            daily_stats[today] += 1
 
-    def check_suspicious_activity(self):
-        global rate_limits, failed_attempts
+    def _sweep_rate_limits(self):
+        # Runs on the event loop thread, same as the request handlers
+        current_time = time.time()
         
         # Check for rate limiting violations
-        current_time = time.time()
         for user_id, count in rate_limits.items():
             if count > MAX_REQUESTS_PER_MINUTE:
                 logger.warning(f"Rate limit violation detected for user {user_id}")
@@ -110,7 +182,11 @@ class MonitoringThread(threading.Thread):
             if current_time - failed_attempts[user_id] > RATE_LIMIT_WINDOW:
                 del failed_attempts[user_id]
 
-    def cleanup_old_data(self):
+        for user_id in list(banned_until.keys()):
+            if banned_until[user_id] <= current_time:
+                del banned_until[user_id]
+
+    def _sync_cleanup_old_data(self):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -118,7 +194,7 @@ class MonitoringThread(threading.Thread):
         cursor.execute('''
             DELETE FROM payments 
             WHERE expires_at < ? AND status = ?
-        ''', (datetime.now(), 'expired'))
+        ''', (int(time.time()), 'expired'))
         
         # Remove old analytics data
         cutoff_date = datetime.now() - timedelta(days=30)
@@ -130,56 +206,33 @@ class MonitoringThread(threading.Thread):
         conn.commit()
         conn.close()
 
-# Start monitoring thread
-monitoring_thread = MonitoringThread("botdata.db")
-monitoring_thread.start()
-
-# TON API configuration
-TON_API_URL = "https://api.ton.org/v1"
-TON_WALLET = os.getenv('TON_WALLET_ADDRESS')
-TON_API_KEY = os.getenv('TON_API_KEY')
-
-# Payment constants
-MIN_PAYMENT_AMOUNT = 0.1  # Minimum payment in TON
-PAYMENT_TIMEOUT = 300  # 5 minutes in seconds
-
-# Payment status
-PAYMENT_STATUS = {
-    'pending': '⏳ Pending',
-    'confirmed': '✅ Confirmed',
-    'expired': '❌ Expired',
-    'failed': '❌ Failed'
-}
-
-class TONPayment:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self.initialize_db()
-        self.session = aiohttp.ClientSession()
-        self.lock = asyncio.Lock()
-        
     async def get_payment_analytics(self) -> Dict[str, Any]:
         """Get payment analytics."""
+        metrics = payment_analytics
+        with stats_lock:
+            daily = dict(daily_stats)
+            methods = dict(payment_methods)
         return {
-            'total_payments': payment_analytics['total_payments'],
-            'successful_payments': payment_analytics['successful_payments'],
-            'failed_payments': payment_analytics['failed_payments'],
-            'total_amount': payment_analytics['total_amount'],
-            'average_amount': payment_analytics['average_amount'],
-            'daily_stats': dict(payment_analytics['daily_stats']),
-            'payment_methods': dict(payment_analytics['payment_methods'])
+            'total_payments': metrics.total_payments,
+            'successful_payments': metrics.successful_payments,
+            'failed_payments': metrics.failed_payments,
+            'total_amount': metrics.total_amount,
+            'average_amount': metrics.average_amount,
+            'daily_stats': daily,
+            'payment_methods': methods
         }
 
     async def check_suspicious_activity(self, user_id: int) -> bool:
         """Check for suspicious activity."""
         current_time = time.time()
         
-        # Check rate limits
-        if rate_limits[user_id] > MAX_REQUESTS_PER_MINUTE:
+        # Known offenders skip the counter checks entirely
+        if banned_until.get(user_id, 0) > current_time:
             return True
-            
-        # Check failed attempts
-        if failed_attempts[user_id] > MAX_FAILED_ATTEMPTS:
+        
+        # Check rate limits and failed attempts
+        if rate_limits[user_id] > MAX_REQUESTS_PER_MINUTE or failed_attempts[user_id] > MAX_FAILED_ATTEMPTS:
+            banned_until[user_id] = current_time + RATE_LIMIT_WINDOW
             return True
             
         # Reset counters if within window
@@ -191,6 +244,7 @@ class TONPayment:
 
     async def create_payment_address(self, user_id: int, amount: float) -> Dict[str, Any]:
         """Create a new payment address for user."""
+        conn = None
         try:
             # Check for suspicious activity
             if await self.check_suspicious_activity(user_id):
@@ -199,111 +253,6 @@ class TONPayment:
             # Increment rate limit counter
             rate_limits[user_id] += 1
             
-            # Validate amount
-            if amount < MIN_PAYMENT_AMOUNT:
-                raise ValueError(f"Minimum payment amount is {MIN_PAYMENT_AMOUNT} TON")
-
-            # Create payment record
-            async with self.lock:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                # Generate unique payment ID
-                payment_id = hashlib.sha256(str(time.time()).encode()).hexdigest()[:10]
-                
-                # Create payment record
-                cursor.execute('''
-                    INSERT INTO payments (user_id, amount, status, payment_address, created_at, expires_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    user_id,
-                    amount,
-                    'pending',
-                    payment_id,
-                    datetime.now(),
-                    datetime.now() + timedelta(seconds=PAYMENT_TIMEOUT)
-                ))
-                
-                conn.commit()
-                payment_id = cursor.lastrowid
-                
-                # Create payment address
-                async with self.session.post(
-                    f"{TON_API_URL}/createPaymentAddress",
-                    headers={'Authorization': f'Bearer {TON_API_KEY}'},
-                    json={
-                        'amount': amount,
-                        'lifetime': PAYMENT_TIMEOUT
-                    }
-                ) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to create payment address: {response.status}")
-                    
-                    data = await response.json()
-                    payment_address = data['address']
-                    
-                    # Update payment record with address
-                    cursor.execute('UPDATE payments SET payment_address = ? WHERE id = ?', 
-                                 (payment_address, payment_id))
-                    conn.commit()
-                
-                return {
-                    'payment_id': payment_id,
-                    'amount': amount,
-                    'address': payment_address,
-                    'expires_at': (datetime.now() + timedelta(seconds=PAYMENT_TIMEOUT)).isoformat()
-                }
-                
-        except Exception as e:
-            # Increment failed attempts
-            failed_attempts[user_id] += 1
-            logger.error(f"Error creating payment address: {str(e)}")
-            raise
-        finally:
-            if 'conn' in locals():
-                conn.close()
-
-    def initialize_db(self):
-        """Initialize payment tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create payments table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                amount REAL,
-                status TEXT,
-                payment_address TEXT,
-                created_at TIMESTAMP,
-                expires_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # Create advertisements table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS advertisements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                payment_id INTEGER,
-                title TEXT,
-                description TEXT,
-                media_url TEXT,
-                status TEXT,
-                created_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                FOREIGN KEY (payment_id) REFERENCES payments(id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-
-    async def create_payment_address(self, user_id: int, amount: float) -> Dict[str, Any]:
-        """Create a new payment address for user."""
-        try:
             # Validate amount
             if amount < MIN_PAYMENT_AMOUNT:
                 raise ValueError(f"Minimum payment amount is {MIN_PAYMENT_AMOUNT} TON")
@@ -314,6 +263,8 @@ class TONPayment:
             
             # Generate unique payment ID
             payment_id = hashlib.sha256(str(time.time()).encode()).hexdigest()[:10]
+            created_at = int(time.time())
+            expires_at = created_at + PAYMENT_TIMEOUT
             
             # Create payment record
             cursor.execute('''
@@ -324,15 +275,16 @@ class TONPayment:
                 amount,
                 'pending',
                 payment_id,
-                datetime.now(),
-                datetime.now() + timedelta(seconds=PAYMENT_TIMEOUT)
+                created_at,
+                expires_at
             ))
             
             conn.commit()
             payment_id = cursor.lastrowid
             
             # Create payment address
-            async with self.session.post(
+            session = await self._get_session()
+            async with session.post(
                 f"{TON_API_URL}/createPaymentAddress",
                 headers={'Authorization': f'Bearer {TON_API_KEY}'},
                 json={
@@ -355,68 +307,179 @@ class TONPayment:
                 'payment_id': payment_id,
                 'amount': amount,
                 'address': payment_address,
-                'expires_at': (datetime.now() + timedelta(seconds=PAYMENT_TIMEOUT)).isoformat()
+                'expires_at': datetime.fromtimestamp(expires_at).isoformat()
             }
             
         except Exception as e:
+            # Increment failed attempts
+            failed_attempts[user_id] += 1
             logger.error(f"Error creating payment address: {str(e)}")
             raise
         finally:
             if conn:
                 conn.close()
 
+    def initialize_db(self):
+        """Initialize payment tables."""
+        conn = sqlite3.connect(self.db_path)
+        
+        # Create tables and indexes in a single script and transaction
+        conn.executescript('''
+            BEGIN;
+            
+            CREATE TABLE IF NOT EXISTS payments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                amount REAL,
+                status TEXT,
+                payment_address TEXT,
+                created_at INTEGER,
+                expires_at INTEGER,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_payments_user ON payments(user_id);
+            CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status);
+            CREATE INDEX IF NOT EXISTS idx_payments_expires ON payments(expires_at);
+            
+            CREATE TABLE IF NOT EXISTS advertisements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                payment_id INTEGER,
+                title TEXT,
+                description TEXT,
+                media_url TEXT,
+                status TEXT,
+                created_at TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id),
+                FOREIGN KEY (payment_id) REFERENCES payments(id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_ads_user ON advertisements(user_id);
+            CREATE INDEX IF NOT EXISTS idx_ads_status ON advertisements(status);
+            CREATE INDEX IF NOT EXISTS idx_ads_payment ON advertisements(payment_id);
+            
+            COMMIT;
+        ''')
+        
+        conn.close()
+
     async def check_payment_status(self, payment_id: int) -> Dict[str, Any]:
         """Check payment status."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM payments WHERE id = ?', (payment_id,))
+            cursor = self._ro_conn.execute('SELECT * FROM payments WHERE id = ?', (payment_id,))
             payment = cursor.fetchone()
             
             if not payment:
                 raise ValueError("Payment not found")
             
             payment_data = {
-                'id': payment[0],
-                'user_id': payment[1],
-                'amount': payment[2],
-                'status': payment[3],
-                'address': payment[4],
-                'created_at': payment[5],
-                'expires_at': payment[6]
+                'id': payment['id'],
+                'user_id': payment['user_id'],
+                'amount': payment['amount'],
+                'status': payment['status'],
+                'address': payment['payment_address'],
+                'created_at': datetime.fromtimestamp(payment['created_at']).isoformat(),
+                'expires_at': datetime.fromtimestamp(payment['expires_at']).isoformat()
             }
             
             # Check if payment has expired
-            if datetime.fromisoformat(payment[6]) < datetime.now():
-                if payment[3] == 'pending':
-                    cursor.execute('UPDATE payments SET status = ? WHERE id = ?', 
-                                 ('expired', payment_id))
-                    conn.commit()
+            if payment['expires_at'] < time.time():
+                if payment['status'] == 'pending':
+                    self.update_payment_status(payment_id, 'expired')
                     payment_data['status'] = 'expired'
                 return payment_data
             
             # Check payment status on TON network
-            async with self.session.get(
-                f"{TON_API_URL}/getPaymentStatus",
-                headers={'Authorization': f'Bearer {TON_API_KEY}'},
-                params={'address': payment[4]}
-            ) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to check payment status: {response.status}")
+            if await self.fetch_network_status(payment['payment_address']) == 'confirmed':
+                self.update_payment_status(payment_id, 'confirmed')
+                payment_data['status'] = 'confirmed'
                 
-                data = await response.json()
+            return payment_data
+            
+        except Exception as e:
+            logger.error(f"Error checking payment status: {str(e)}")
+            raise
+
+    def update_payment_status(self, payment_id: int, status: str):
+        """Update stored status of a payment."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('UPDATE payments SET status = ? WHERE id = ?', (status, payment_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def fetch_network_status(self, address: str) -> str:
+        """Get payment status for an address from the TON network."""
+        session = await self._get_session()
+        async with session.get(
+            f"{TON_API_URL}/getPaymentStatus",
+            headers={'Authorization': f'Bearer {TON_API_KEY}'},
+            params={'address': address}
+        ) as response:
+            if response.status != 200:
+                raise Exception(f"Failed to check payment status: {response.status}")
+            
+            data = await response.json()
+            return data['status']
+
+    async def check_payment_statuses(self, payment_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Check status of several payments with one query and concurrent TON calls."""
+        if not payment_ids:
+            return {}
+            
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            placeholders = ','.join('?' * len(payment_ids))
+            cursor.execute(f'SELECT * FROM payments WHERE id IN ({placeholders})', list(payment_ids))
+            
+            payments = {}
+            to_check = []
+            updates = []
+            now = time.time()
+            for payment in cursor.fetchall():
+                payment_data = {
+                    'id': payment['id'],
+                    'user_id': payment['user_id'],
+                    'amount': payment['amount'],
+                    'status': payment['status'],
+                    'address': payment['payment_address'],
+                    'created_at': datetime.fromtimestamp(payment['created_at']).isoformat(),
+                    'expires_at': datetime.fromtimestamp(payment['expires_at']).isoformat()
+                }
+                payments[payment['id']] = payment_data
                 
-                if data['status'] == 'confirmed':
-                    cursor.execute('UPDATE payments SET status = ? WHERE id = ?', 
-                                 ('confirmed', payment_id))
-                    conn.commit()
+                # Expired payments never reach the TON network
+                if payment['expires_at'] < now:
+                    if payment['status'] == 'pending':
+                        payment_data['status'] = 'expired'
+                        updates.append(('expired', payment['id']))
+                else:
+                    to_check.append(payment_data)
+            
+            # Check remaining payments on TON network concurrently
+            results = await asyncio.gather(
+                *(self.fetch_network_status(p['address']) for p in to_check),
+                return_exceptions=True
+            )
+            for payment_data, result in zip(to_check, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error checking payment {payment_data['id']}: {str(result)}")
+                elif result == 'confirmed' and payment_data['status'] != 'confirmed':
                     payment_data['status'] = 'confirmed'
+                    updates.append(('confirmed', payment_data['id']))
+            
+            if updates:
+                cursor.executemany('UPDATE payments SET status = ? WHERE id = ?', updates)
+                conn.commit()
                 
-            return payment_data
+            return payments
             
         except Exception as e:
-            logger.error(f"Error checking payment status: {str(e)}")
+            logger.error(f"Error checking payment statuses: {str(e)}")
             raise
         finally:
             if conn:
@@ -424,15 +487,22 @@ class TONPayment:
 
     async def create_advertisement(self, user_id: int, payment_id: int, title: str, description: str, media_url: str) -> int:
         """Create a new advertisement."""
+        conn = None
         try:
-            # Validate payment status
-            payment = await self.check_payment_status(payment_id)
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            # Validate payment status and insert within one write transaction
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT status FROM payments WHERE id = ?', (payment_id,))
+            payment = cursor.fetchone()
+            
+            if not payment:
+                raise ValueError("Payment not found")
             if payment['status'] != 'confirmed':
                 raise ValueError("Payment not confirmed")
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             cursor.execute('''
                 INSERT INTO advertisements (user_id, payment_id, title, description, media_url, status)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -444,11 +514,14 @@ class TONPayment:
                 media_url,
                 'active'
             ))
+            ad_id = cursor.lastrowid
             
-            conn.commit()
-            return cursor.lastrowid
+            cursor.execute('COMMIT')
+            return ad_id
             
         except Exception as e:
+            if conn and conn.in_transaction:
+                conn.rollback()
             logger.error(f"Error creating advertisement: {str(e)}")
             raise
         finally:
@@ -458,8 +531,7 @@ class TONPayment:
     async def get_advertisements(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get list of advertisements."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self._ro_conn.cursor()
             
             if user_id:
                 cursor.execute('SELECT * FROM advertisements WHERE user_id = ?', (user_id,))
@@ -467,25 +539,22 @@ class TONPayment:
                 cursor.execute('SELECT * FROM advertisements WHERE status = ?', ('active',))
             
             ads = []
-            for ad in cursor.fetchall():
-                ads.append({
-                    'id': ad[0],
-                    'user_id': ad[1],
-                    'title': ad[3],
-                    'description': ad[4],
-                    'media_url': ad[5],
-                    'status': ad[6],
-                    'created_at': ad[7]
-                })
+            while (rows := cursor.fetchmany(1000)):
+                ads.extend({
+                    'id': ad['id'],
+                    'user_id': ad['user_id'],
+                    'title': ad['title'],
+                    'description': ad['description'],
+                    'media_url': ad['media_url'],
+                    'status': ad['status'],
+                    'created_at': ad['created_at']
+                } for ad in rows)
             
             return ads
             
         except Exception as e:
             logger.error(f"Error getting advertisements: {str(e)}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     async def create_payment_keyboard(self, payment_id: int) -> InlineKeyboardMarkup:
         """Create keyboard with payment status button."""
@@ -1,10 +1,12 @@
 import sqlite3
-import os
+import asyncio
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
 from gpt_platform import GPTPlatform
+from security import verify_password
+from db_pool import DB_PATH
 import re
-import random
+import secrets
 
 # Password strength levels
 WEAK = 1
@@ -20,12 +22,20 @@ REQUIREMENTS = [
     r'[!@#$%^&*(),.?":{}|<>]'  # Special characters
 ]
 
+# Allowed GPT username characters
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_]+$')
+
+# Character pool for generated password suggestions
+_PW_POOL = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%^&*()'
+
+# Shared GPT platform client so its HTTP session is reused across requests
+_gpt_platform = GPTPlatform()
+
 # Define conversation states
 CURRENT_PASSWORD, GPT_USERNAME, GPT_PASSWORD, CONFIRM_UPDATE = range(4)
 
 def get_db_connection():
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db')
-    return sqlite3.connect(db_path)
+    return sqlite3.connect(DB_PATH)
 
 async def update_credentials(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start the credentials update process."""
@@ -43,12 +53,12 @@ async def process_current_password(update: Update, context: ContextTypes.DEFAULT
     # Verify current password
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE user_id = ? AND password = ?', 
-                  (context.user_data['user_id'], current_password))
+    cursor.execute('SELECT password_hash FROM users WHERE user_id = ?', 
+                  (context.user_data['user_id'],))
     user = cursor.fetchone()
     conn.close()
     
-    if not user:
+    if not user or not await asyncio.to_thread(verify_password, current_password, user[0]):
         await update.message.reply_text("Incorrect current password.\n"
                                      "Would you like to try again? Send /update_credentials")
         return ConversationHandler.END
@@ -71,13 +81,13 @@ async def process_new_gpt_username(update: Update, context: ContextTypes.DEFAULT
                                      "Please try again:")
         return GPT_USERNAME
     
-    if not re.match(r'^[a-zA-Z0-9_]+$', gpt_username):
+    if not _USERNAME_RE.match(gpt_username):
         await update.message.reply_text("Username can only contain letters, numbers, and underscores.\n"
                                      "Please try again:")
         return GPT_USERNAME
     
     # Validate username with GPT platform
-    gpt = GPTPlatform()
+    gpt = _gpt_platform
     if not await gpt.validate_credentials(gpt_username, context.user_data.get('gpt_password')):
         await update.message.reply_text("This GPT username is not valid or doesn't exist.\n"
                                      "Please check your credentials and try again.")
@@ -106,7 +116,7 @@ async def process_new_gpt_password(update: Update, context: ContextTypes.DEFAULT
     gpt_password = update.message.text
     
     # Check password strength
-    strength = check_password_strength(gpt_password)
+    strength = await asyncio.to_thread(check_password_strength, gpt_password)
     
     if strength == WEAK:
         await update.message.reply_text("Password is too weak.\n"
@@ -127,7 +137,7 @@ async def process_new_gpt_password(update: Update, context: ContextTypes.DEFAULT
         return GPT_PASSWORD
     
     # Validate with GPT platform
-    gpt = GPTPlatform()
+    gpt = _gpt_platform
     if not await gpt.validate_credentials(context.user_data['new_gpt_username'], gpt_password):
         await update.message.reply_text("These GPT credentials are not valid.\n"
                                      "Please check your credentials and try again.")
@@ -220,14 +230,10 @@ def check_password_strength(password: str) -> int:
 
 def generate_password_suggestions() -> list:
     """Generate random password suggestions."""
-    suggestions = []
-    for _ in range(3):
-        password = ''.join(random.choices(
-            'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%^&*()',
-            k=random.randint(12, 16)
-        ))
-        suggestions.append(password)
-    return suggestions
+    return [
+        ''.join(secrets.choice(_PW_POOL) for _ in range(secrets.randbelow(5) + 12))
+        for _ in range(3)
+    ]
 
 def get_credentials_handlers():
     """Return the credentials update conversation handler."""
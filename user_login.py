@@ -1,15 +1,25 @@
-import sqlite3
-import os
+import asyncio
+from typing import Optional
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
+from db_pool import borrow_conn
+from security import verify_password
 
 # Define conversation states
 USERNAME, PASSWORD = range(2)
 
-# Database connection
-def get_db_connection():
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db')
-    return sqlite3.connect(db_path)
+_Q_USERNAME_EXISTS = 'SELECT 1 FROM users WHERE username = ? LIMIT 1'
+_Q_USER_HASH_BY_NAME = 'SELECT id, password_hash FROM users WHERE username = ? LIMIT 1'
+
+def _username_exists(username: str) -> bool:
+    """Check whether a username is registered."""
+    with borrow_conn() as conn:
+        return conn.execute(_Q_USERNAME_EXISTS, (username,)).fetchone() is not None
+
+def _lookup_password_hash(username: str) -> Optional[tuple]:
+    """Get (id, password_hash) for a username."""
+    with borrow_conn() as conn:
+        return conn.execute(_Q_USER_HASH_BY_NAME, (username,)).fetchone()
 
 async def login(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start the login process."""
@@ -28,13 +38,7 @@ async def process_login_username(update: Update, context: ContextTypes.DEFAULT_T
     username = update.message.text.strip()
     
     # Check if username exists in the database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = cursor.fetchone()
-    conn.close()
-    
-    if not user:
+    if not await asyncio.to_thread(_username_exists, username):
         await update.message.reply_text("Username not found.\n"
                                      "Would you like to register?\n"
                                      "Send /register to start registration.")
@@ -56,13 +60,9 @@ async def process_login_password(update: Update, context: ContextTypes.DEFAULT_T
         return ConversationHandler.END
     
     # Verify credentials
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
-    user = cursor.fetchone()
-    conn.close()
+    user = await asyncio.to_thread(_lookup_password_hash, username)
     
-    if user:
+    if user and await asyncio.to_thread(verify_password, password, user[1]):
         # Mark user as logged in
         context.user_data['logged_in'] = True
         context.user_data['user_id'] = user[0]  # Store user ID
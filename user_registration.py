@@ -1,25 +1,27 @@
 import sqlite3
-import os
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
-from typing import Dict, Any, Optional
-import sqlite3
+from typing import Dict, Any, Optional, Tuple
 import logging
-import os
 import time
+from datetime import datetime
+import asyncio
 from security_checks import SecurityChecks
 from registration_constants import RegistrationStates, RegistrationMessages
 from registration_analytics import RegistrationAnalytics
 from registration_validation import RegistrationValidator
 from registration_helpers import RegistrationHelper
+from db_pool import borrow_conn, ensure_indexes, DB_PATH
+from security import hash_password
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize managers
-security = SecurityChecks(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db'))
-analytics = RegistrationAnalytics(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db'))
+security = SecurityChecks(DB_PATH)
+analytics = RegistrationAnalytics(DB_PATH)
+ensure_indexes()
 validator = RegistrationValidator()
 helper = RegistrationHelper()
 
@@ -27,44 +29,141 @@ helper = RegistrationHelper()
 RATE_LIMIT = 5  # max attempts per hour
 RATE_LIMIT_PERIOD = 3600  # 1 hour in seconds
 
-# Database connection
-def get_db_connection():
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db')
-    return sqlite3.connect(db_path)
-
-def get_user_attempts(user_id: int) -> int:
-    """Get number of registration attempts in the last hour."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+# Static reply keyboards, built once at import
+_AGREEMENT_KBD = ReplyKeyboardMarkup(
+    RegistrationMessages.KEYBOARD[0],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+_CONFIRM_KBD = ReplyKeyboardMarkup(
+    RegistrationMessages.KEYBOARD[1],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+
+# Rate-limit count and registration state for /start in one round-trip
+_Q_START_STATE = '''
+    SELECT 
+        (SELECT COUNT(*) FROM registration_attempts 
+         WHERE user_id = ? AND attempt_timestamp >= datetime('now', ?)),
+        (SELECT id FROM users WHERE telegram_id = ?),
+        (SELECT agreement_accepted FROM users WHERE telegram_id = ?)
+'''
+_Q_USERNAME_EXISTS = 'SELECT 1 FROM users WHERE username = ? LIMIT 1'
+# Lookup and update in one statement (RETURNING needs SQLite 3.35+)
+_Q_ACCEPT_AGREEMENT = '''
+    UPDATE users SET agreement_accepted = 1 
+    WHERE telegram_id = ? AND agreement_accepted = 0 
+    RETURNING id
+'''
+# Only the password hash is stored; the legacy plaintext column is left empty
+_Q_INSERT_USER = '''
+    INSERT INTO users (telegram_id, username, password, password_hash, 
+                       gpt_username, gpt_password, points, 
+                       agreement_accepted, registration_date)
+    VALUES (?, ?, '', ?, ?, ?, 0, 1, CURRENT_TIMESTAMP)
+'''
+_Q_INSERT_EVENT = '''
+    INSERT INTO registration_analytics (user_id, event_type, event_data, status)
+    VALUES (?, ?, ?, ?)
+'''
+_Q_INSERT_ATTEMPT = '''
+    INSERT INTO registration_attempts (user_id, step, error_type, error_message)
+    VALUES (?, ?, ?, ?)
+'''
+
+# Failed attempts are queued and written in batches by a single writer task
+ATTEMPT_BATCH_SIZE = 100
+_attempt_queue: Optional[asyncio.Queue] = None
+_log_writer_task: Optional[asyncio.Task] = None
+
+def _write_attempts(batch: list):
+    """Insert a batch of attempts in one transaction."""
+    with borrow_conn() as conn:
+        conn.execute('BEGIN')
+        conn.executemany(_Q_INSERT_ATTEMPT, batch)
+        conn.execute('COMMIT')
+
+async def _log_writer():
+    """Drain the attempt queue, writing whatever has accumulated per pass."""
+    while True:
+        batch = [await _attempt_queue.get()]
+        while len(batch) < ATTEMPT_BATCH_SIZE and not _attempt_queue.empty():
+            batch.append(_attempt_queue.get_nowait())
+        try:
+            await asyncio.to_thread(_write_attempts, batch)
+        except sqlite3.Error as e:
+            logger.error(f"Error logging attempts: {str(e)}")
+
+async def flush_attempts(_application=None):
+    """Stop the writer and store attempts still queued; used as a shutdown hook."""
+    if _log_writer_task is not None and not _log_writer_task.done():
+        _log_writer_task.cancel()
+        try:
+            await _log_writer_task
+        except asyncio.CancelledError:
+            pass
+    if _attempt_queue is None or _attempt_queue.empty():
+        return
+    batch = []
+    while not _attempt_queue.empty():
+        batch.append(_attempt_queue.get_nowait())
     try:
-        cursor.execute('''
-            SELECT COUNT(*) 
-            FROM registration_attempts 
-            WHERE user_id = ? 
-            AND attempt_timestamp >= datetime('now', ?)
-        ''', (user_id, f'-{RATE_LIMIT_PERIOD} seconds'))
-        return cursor.fetchone()[0]
+        await asyncio.to_thread(_write_attempts, batch)
     except sqlite3.Error as e:
-        logger.error(f"Error getting attempts: {str(e)}")
-        return 0
-    finally:
-        conn.close()
+        logger.error(f"Error logging attempts: {str(e)}")
 
 def log_attempt(user_id: int, step: str, error_type: str, error_message: str):
-    """Log a registration attempt."""
-    analytics.log_attempt(user_id, step, error_type, error_message)
-    validator.log_validation_attempt(user_id, step, {'error': error_message}, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botdata.db'))
-    helper.log_attempt(user_id, step, error_type, error_message)
-
-def log_event(user_id: int, event_type: str, event_data: Dict[str, Any], status: str = 'success'):
+    """Queue a registration attempt for the background writer."""
+    global _attempt_queue, _log_writer_task
+    if _log_writer_task is None or _log_writer_task.done():
+        # Created here so the queue belongs to the running event loop
+        if _attempt_queue is None:
+            _attempt_queue = asyncio.Queue()
+        _log_writer_task = asyncio.get_running_loop().create_task(_log_writer())
+    _attempt_queue.put_nowait((user_id, step, error_type, error_message))
+
+async def log_event(user_id: int, event_type: str, event_data: Dict[str, Any], status: str = 'success'):
     """Log a registration event."""
-    analytics.log_event(user_id, event_type, event_data, status)
+    await asyncio.to_thread(analytics.log_event, user_id, event_type, event_data, status)
+
+def _fetch_start_state(telegram_id: int) -> Tuple[int, Optional[int], Optional[int]]:
+    """Get (recent attempts, user id, agreement_accepted) for a Telegram user."""
+    with borrow_conn() as conn:
+        try:
+            return conn.execute(
+                _Q_START_STATE,
+                (telegram_id, f'-{RATE_LIMIT_PERIOD} seconds', telegram_id, telegram_id)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error getting start state: {str(e)}")
+            return 0, None, None
+
+def _accept_agreement(telegram_id: int) -> bool:
+    """Accept the agreement for an existing user who has not yet accepted it."""
+    with borrow_conn() as conn:
+        return conn.execute(_Q_ACCEPT_AGREEMENT, (telegram_id,)).fetchone() is not None
+
+def _username_exists(username: str) -> bool:
+    """Check whether a username is already taken."""
+    with borrow_conn() as conn:
+        return conn.execute(_Q_USERNAME_EXISTS, (username,)).fetchone() is not None
+
+def _register_user(user_params: tuple, event_params: tuple):
+    """Insert a registered user and its completion event in one transaction."""
+    with borrow_conn() as conn:
+        conn.execute('BEGIN')
+        conn.execute(_Q_INSERT_USER, user_params)
+        conn.execute(_Q_INSERT_EVENT, event_params)
+        conn.execute('COMMIT')
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start command handler."""
+    attempts, user_id, agreement_accepted = await asyncio.to_thread(
+        _fetch_start_state, update.effective_user.id
+    )
+
     # Check rate limit
-    attempts = get_user_attempts(update.effective_user.id)
     if attempts >= RATE_LIMIT:
         log_attempt(
             update.effective_user.id,
@@ -78,44 +177,26 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return ConversationHandler.END
 
     # Check if user is already registered
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, agreement_accepted FROM users WHERE telegram_id = ?', (update.effective_user.id,))
-    user = cursor.fetchone()
-    conn.close()
-    
-    if user:
-        if user[1]:  # agreement_accepted
+    if user_id is not None:
+        if agreement_accepted:
             await update.message.reply_text("You are already registered!")
             return ConversationHandler.END
         else:
             # Show agreement again
-            keyboard = ReplyKeyboardMarkup(
-                RegistrationMessages.KEYBOARD[0],
-                resize_keyboard=True,
-                one_time_keyboard=True
-            )
-            
             await update.message.reply_text(
                 RegistrationMessages.WELCOME + "\n\n" + RegistrationMessages.TERMS_OF_SERVICE,
-                reply_markup=keyboard
+                reply_markup=_AGREEMENT_KBD
             )
             return RegistrationStates.AGREEMENT
 
     # Show agreement
-    keyboard = ReplyKeyboardMarkup(
-        RegistrationMessages.KEYBOARD[0],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
-    
     await update.message.reply_text(
         RegistrationMessages.WELCOME + "\n\n" + RegistrationMessages.TERMS_OF_SERVICE,
-        reply_markup=keyboard
+        reply_markup=_AGREEMENT_KBD
     )
     
     # Log start event
-    log_event(
+    await log_event(
         update.effective_user.id,
         "registration_start",
         {
@@ -129,7 +210,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def agreement(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle agreement response."""
-    if update.message.text.lower() != "accept":
+    # Compare lengths first so long inputs are never lowercased
+    text = update.message.text
+    if len(text) != 6 or text.lower() != "accept":
         log_attempt(
             update.effective_user.id,
             "agreement",
@@ -143,24 +226,15 @@ async def agreement(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return ConversationHandler.END
 
     # Check if user exists but needs agreement
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id FROM users WHERE telegram_id = ?', (update.effective_user.id,))
-    user = cursor.fetchone()
-    
-    if user:
-        # Update agreement status
-        cursor.execute('UPDATE users SET agreement_accepted = 1 WHERE id = ?', (user[0],))
-        conn.commit()
+    if await asyncio.to_thread(_accept_agreement, update.effective_user.id):
         await update.message.reply_text(
             RegistrationMessages.SUCCESS,
             reply_markup=ReplyKeyboardRemove()
         )
-        conn.close()
         return ConversationHandler.END
 
     # Log agreement acceptance
-    log_event(
+    await log_event(
         update.effective_user.id,
         "agreement_accepted",
         {
@@ -181,9 +255,10 @@ async def username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     username = update.message.text.strip()
     
     # Get remaining attempts
-    remaining_attempts = helper.get_remaining_attempts(update.effective_user.id, 'username')
+    remaining_attempts, time_remaining = await asyncio.to_thread(
+        helper.fetch_rate_state, update.effective_user.id, 'username'
+    )
     if remaining_attempts <= 0:
-        time_remaining = helper.get_time_remaining(update.effective_user.id, 'username')
         if time_remaining:
             minutes = int(time_remaining.total_seconds() // 60)
             seconds = int(time_remaining.total_seconds() % 60)
@@ -202,19 +277,12 @@ async def username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             result['error']
         )
         await update.message.reply_text(
-            helper.format_error_message(
-                "validation_error",
-                result['error'],
-                'username'
-            )
+            helper.format_error_message(result['error'], remaining_attempts)
         )
         return RegistrationStates.USERNAME
 
     # Check username uniqueness
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
-    if cursor.fetchone():
+    if await asyncio.to_thread(_username_exists, username):
         log_attempt(
             update.effective_user.id,
             "username",
@@ -222,18 +290,12 @@ async def username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             "Username already exists"
         )
         await update.message.reply_text(
-            helper.format_error_message(
-                "exists",
-                "Username already exists",
-                'username'
-            )
+            helper.format_error_message("Username already exists", remaining_attempts)
         )
-        conn.close()
         return RegistrationStates.USERNAME
-    conn.close()
 
     # Log username selection
-    log_event(
+    await log_event(
         update.effective_user.id,
         "username_selected",
         {
@@ -258,9 +320,10 @@ async def password(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     password = update.message.text.strip()
     
     # Get remaining attempts
-    remaining_attempts = helper.get_remaining_attempts(update.effective_user.id, 'password')
+    remaining_attempts, time_remaining = await asyncio.to_thread(
+        helper.fetch_rate_state, update.effective_user.id, 'password'
+    )
     if remaining_attempts <= 0:
-        time_remaining = helper.get_time_remaining(update.effective_user.id, 'password')
         if time_remaining:
             minutes = int(time_remaining.total_seconds() // 60)
             seconds = int(time_remaining.total_seconds() % 60)
@@ -279,16 +342,12 @@ async def password(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             result['error']
         )
         await update.message.reply_text(
-            helper.format_error_message(
-                "validation_error",
-                result['error'],
-                'password'
-            )
+            helper.format_error_message(result['error'], remaining_attempts)
         )
         return RegistrationStates.PASSWORD
 
     # Log password validation
-    log_event(
+    await log_event(
         update.effective_user.id,
         "password_validated",
         {
@@ -313,9 +372,10 @@ async def gpt_credentials(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     credentials = update.message.text.strip().split('|')
     
     # Get remaining attempts
-    remaining_attempts = helper.get_remaining_attempts(update.effective_user.id, 'gpt_credentials')
+    remaining_attempts, time_remaining = await asyncio.to_thread(
+        helper.fetch_rate_state, update.effective_user.id, 'gpt_credentials'
+    )
     if remaining_attempts <= 0:
-        time_remaining = helper.get_time_remaining(update.effective_user.id, 'gpt_credentials')
         if time_remaining:
             minutes = int(time_remaining.total_seconds() // 60)
             seconds = int(time_remaining.total_seconds() % 60)
@@ -332,11 +392,7 @@ async def gpt_credentials(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "Credentials not in username|password format"
         )
         await update.message.reply_text(
-            helper.format_error_message(
-                "invalid_format",
-                "Credentials must be in format: username|password",
-                'gpt_credentials'
-            )
+            helper.format_error_message("Credentials must be in format: username|password", remaining_attempts)
         )
         return RegistrationStates.GPT_CREDENTIALS
 
@@ -352,16 +408,12 @@ async def gpt_credentials(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             result['error']
         )
         await update.message.reply_text(
-            helper.format_error_message(
-                "validation_error",
-                result['error'],
-                'gpt_credentials'
-            )
+            helper.format_error_message(result['error'], remaining_attempts)
         )
         return RegistrationStates.GPT_CREDENTIALS
 
     # Log GPT credentials validation
-    log_event(
+    await log_event(
         update.effective_user.id,
         "gpt_credentials_validated",
         {
@@ -376,53 +428,13 @@ async def gpt_credentials(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     context.user_data['gpt_password'] = gpt_password
 
     # Show progress and confirmation
-    keyboard = ReplyKeyboardMarkup(
-        RegistrationMessages.KEYBOARD[1],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
-    
     await update.message.reply_text(
         f"{helper.get_progress_message(context.user_data)}\n\n" +
         RegistrationMessages.get_confirmation_message(context.user_data),
-        reply_markup=keyboard
+        reply_markup=_CONFIRM_KBD
     )
     return RegistrationStates.CONFIRMATION
 
-    # Save to database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            INSERT INTO users (telegram_id, username, password, 
-                             gpt_username, gpt_password, points, 
-                             agreement_accepted, registration_date)
-            VALUES (?, ?, ?, ?, ?, 0, 1, CURRENT_TIMESTAMP)
-        ''', (
-            update.effective_user.id,
-            context.user_data['username'],
-            context.user_data['password'],
-            context.user_data['gpt_username'],
-            context.user_data['gpt_password']
-        ))
-        conn.commit()
-        
-        await update.message.reply_text(
-            "Registration completed successfully!\n\n"
-            "You can now use all bot commands."
-        )
-    except sqlite3.Error as e:
-        logger.error(f"Error registering user: {str(e)}")
-        security.log_failed_attempt(update.effective_user.id, 'registration', str(e))
-        await update.message.reply_text(
-            "Error registering user. Please try again."
-        )
-    finally:
-        conn.close()
-
-    return ConversationHandler.END
-
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel the registration process."""
     await update.message.reply_text(
@@ -436,9 +448,10 @@ async def confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     start_time = time.time()
     
     # Get remaining attempts
-    remaining_attempts = helper.get_remaining_attempts(update.effective_user.id, 'confirmation')
+    remaining_attempts, time_remaining = await asyncio.to_thread(
+        helper.fetch_rate_state, update.effective_user.id, 'confirmation'
+    )
     if remaining_attempts <= 0:
-        time_remaining = helper.get_time_remaining(update.effective_user.id, 'confirmation')
         if time_remaining:
             minutes = int(time_remaining.total_seconds() // 60)
             seconds = int(time_remaining.total_seconds() % 60)
@@ -447,7 +460,9 @@ async def confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             )
             return RegistrationStates.CONFIRMATION
 
-    if update.message.text.lower() != "confirm":
+    # Compare lengths first so long inputs are never lowercased
+    text = update.message.text
+    if len(text) != 7 or text.lower() != "confirm":
         log_attempt(
             update.effective_user.id,
             "confirmation",
@@ -477,35 +492,26 @@ async def confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return RegistrationStates.START
 
     # Save to database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    password_hash = await asyncio.to_thread(hash_password, context.user_data['password'])
+    duration = int(time.time() - start_time)
+    event_data = {
+        "username": context.user_data['username'],
+        "gpt_username": context.user_data['gpt_username'],
+        "duration_seconds": duration,
+        "timestamp": datetime.now().isoformat()
+    }
     try:
-        cursor.execute('''
-            INSERT INTO users (telegram_id, username, password, 
-                             gpt_username, gpt_password, points, 
-                             agreement_accepted, registration_date)
-            VALUES (?, ?, ?, ?, ?, 0, 1, CURRENT_TIMESTAMP)
-        ''', (
-            update.effective_user.id,
-            context.user_data['username'],
-            context.user_data['password'],
-            context.user_data['gpt_username'],
-            context.user_data['gpt_password']
-        ))
-        conn.commit()
-        
-        # Log successful registration
-        duration = int(time.time() - start_time)
-        log_event(
-            update.effective_user.id,
-            "registration_completed",
-            {
-                "username": context.user_data['username'],
-                "gpt_username": context.user_data['gpt_username'],
-                "duration_seconds": duration,
-                "timestamp": datetime.now().isoformat()
-            }
+        # User row and successful-registration event share one commit
+        await asyncio.to_thread(
+            _register_user,
+            (
+                update.effective_user.id,
+                context.user_data['username'],
+                password_hash,
+                context.user_data['gpt_username'],
+                context.user_data['gpt_password']
+            ),
+            (update.effective_user.id, "registration_completed", str(event_data), 'success')
         )
         
         await update.message.reply_text(
@@ -524,8 +530,6 @@ async def confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         await update.message.reply_text(
             RegistrationMessages.ERROR_SYSTEM
         )
-    finally:
-        conn.close()
 
     return ConversationHandler.END
 
@@ -1,10 +1,69 @@
 import sqlite3
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from typing import List, Dict, Any, Tuple
+
+# Per-user preference cache: entry lifetime in seconds and size bound
+PREF_CACHE_TTL = 60
+PREF_CACHE_MAX_USERS = 10000
+
+# Hot-path SQL, hoisted so every call reuses the same cached prepared statement
+STATEMENT_CACHE_SIZE = 128
+_Q_SEED_CATEGORY = 'INSERT OR IGNORE INTO video_categories (id, name, points) VALUES (?, ?, ?)'
+_Q_SET_PREF = '''
+    INSERT OR REPLACE INTO user_preferences 
+    (user_id, category_id, preference_level) 
+    VALUES (?, ?, ?)
+'''
+_Q_GET_PREFS = '''
+    SELECT vc.id, vc.name, vc.points, 
+           COALESCE(up.preference_level, 3) AS preference_level  -- Default to 3 if not set
+    FROM video_categories vc
+    LEFT JOIN user_preferences up ON vc.id = up.category_id AND up.user_id = ?
+    ORDER BY CASE WHEN up.preference_level IS NULL THEN 0 ELSE up.preference_level END DESC
+'''
+_Q_GET_RECS = '''
+    SELECT v.id, v.title, v.url, vc.name AS category, vc.points
+    FROM videos v
+    JOIN video_category_map vcm ON v.id = vcm.video_id
+    JOIN video_categories vc ON vcm.category_id = vc.id
+    JOIN user_preferences up ON up.category_id = vcm.category_id AND up.user_id = ?
+    ORDER BY up.preference_level DESC, vc.points DESC
+    LIMIT ?
+'''
+
+# Cold-start recommendations: top videos by category points, refreshed periodically
+DEFAULT_RECS_SIZE = 50
+DEFAULT_RECS_TTL = 300
+_Q_DEFAULT_RECS = '''
+    SELECT v.id, v.title, v.url, vc.name AS category, vc.points
+    FROM videos v
+    JOIN video_category_map vcm ON v.id = vcm.video_id
+    JOIN video_categories vc ON vcm.category_id = vc.id
+    ORDER BY vc.points DESC
+    LIMIT ?
+'''
 
 class VideoCategories:
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # One long-lived connection shared across threads, serialized by the lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+        self._conn.execute('PRAGMA cache_size=-64000')
+        self._conn.row_factory = sqlite3.Row
+        self._pref_cache: Dict[int, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._default_recs: List[Dict[str, Any]] = []
+        self._default_recs_at = 0.0
         self.categories = [
             {'id': 1, 'name': 'Education', 'points': 10},
             {'id': 2, 'name': 'Entertainment', 'points': 8},
@@ -12,47 +71,59 @@ class VideoCategories:
             {'id': 4, 'name': 'Business', 'points': 15},
             {'id': 5, 'name': 'Health', 'points': 10}
         ]
+        self._categories_by_id = {cat['id']: cat for cat in self.categories}
+        self._points_by_id = {cat['id']: cat['points'] for cat in self.categories}
         self.initialize_db()
 
     def initialize_db(self):
         """Initialize video categories tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create video categories table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS video_categories (
-                id INTEGER PRIMARY KEY,
-                name TEXT,
-                points INTEGER
-            )
-        ''')
-        
-        # Create user preferences table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_preferences (
-                user_id INTEGER,
-                category_id INTEGER,
-                preference_level INTEGER,
-                PRIMARY KEY (user_id, category_id)
-            )
-        ''')
-        
-        # Create video category mapping table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS video_category_map (
-                video_id INTEGER,
-                category_id INTEGER,
-                PRIMARY KEY (video_id, category_id)
-            )
-        ''')
-        
-        # Insert default categories
-        cursor.executemany('INSERT OR IGNORE INTO video_categories (id, name, points) VALUES (?, ?, ?)',
-                         [(cat['id'], cat['name'], cat['points']) for cat in self.categories])
-        
-        conn.commit()
-        conn.close()
+        with self._lock:
+            cursor = self._conn.cursor()
+            
+            # Create video categories table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS video_categories (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    points INTEGER
+                )
+            ''')
+            
+            # Create user preferences table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_preferences (
+                    user_id INTEGER,
+                    category_id INTEGER,
+                    preference_level INTEGER,
+                    PRIMARY KEY (user_id, category_id)
+                )
+            ''')
+            
+            # Create video category mapping table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS video_category_map (
+                    video_id INTEGER,
+                    category_id INTEGER,
+                    PRIMARY KEY (video_id, category_id)
+                )
+            ''')
+            
+            # Category-first index for the recommender join; user_preferences
+            # lookups by user_id are already covered by its primary key
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_vcm_cat 
+                ON video_category_map(category_id, video_id)
+            ''')
+            
+            # Insert default categories in one write transaction
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.executemany(_Q_SEED_CATEGORY,
+                                 [(cat['id'], cat['name'], cat['points']) for cat in self.categories])
+                cursor.execute('COMMIT')
+            except sqlite3.Error:
+                cursor.execute('ROLLBACK')
+                raise
 
     def get_categories(self) -> List[Dict[str, Any]]:
         """Get all video categories."""
@@ -60,10 +131,7 @@ class VideoCategories:
 
     def get_category_points(self, category_id: int) -> int:
         """Get points for a specific category."""
-        for cat in self.categories:
-            if cat['id'] == category_id:
-                return cat['points']
-        return 0
+        return self._points_by_id.get(category_id, 0)
 
     def set_user_preference(self, user_id: int, category_id: int, preference_level: int) -> bool:
         """
@@ -79,22 +147,14 @@ class VideoCategories:
         """
         if preference_level < 1 or preference_level > 5:
             return False
-            
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO user_preferences 
-                (user_id, category_id, preference_level) 
-                VALUES (?, ?, ?)
-            ''', (user_id, category_id, preference_level))
-            conn.commit()
+            with self._lock:
+                self._conn.execute(_Q_SET_PREF, (user_id, category_id, preference_level))
+            self._pref_cache.pop(user_id, None)
             return True
         except:
             return False
-        finally:
-            conn.close()
 
     def get_user_preferences(self, user_id: int) -> List[Dict[str, Any]]:
         """
@@ -103,26 +163,18 @@ class VideoCategories:
         Returns:
             list: List of category preferences
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT vc.id, vc.name, vc.points, up.preference_level
-            FROM video_categories vc
-            LEFT JOIN user_preferences up ON vc.id = up.category_id AND up.user_id = ?
-            ORDER BY CASE WHEN up.preference_level IS NULL THEN 0 ELSE up.preference_level END DESC
-        ''', (user_id,))
+        cached = self._pref_cache.get(user_id)
+        if cached and time.monotonic() - cached[0] < PREF_CACHE_TTL:
+            return cached[1]
         
-        preferences = []
-        for row in cursor.fetchall():
-            preferences.append({
-                'id': row[0],
-                'name': row[1],
-                'points': row[2],
-                'preference_level': row[3] or 3  # Default to 3 if not set
-            })
+        with self._lock:
+            cursor = self._conn.execute(_Q_GET_PREFS, (user_id,))
+            preferences = [dict(row) for row in cursor]
+            
+            if len(self._pref_cache) >= PREF_CACHE_MAX_USERS:
+                self._pref_cache.clear()
+            self._pref_cache[user_id] = (time.monotonic(), preferences)
         
-        conn.close()
         return preferences
 
     def get_recommended_videos(self, user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
@@ -136,38 +188,24 @@ class VideoCategories:
         Returns:
             list: List of recommended videos
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get user preferences
-        preferences = self.get_user_preferences(user_id)
-        
-        # Get videos ordered by preference
-        cursor.execute('''
-            SELECT v.id, v.title, v.url, vc.name as category_name, vc.points
-            FROM videos v
-            JOIN video_category_map vcm ON v.id = vcm.video_id
-            JOIN video_categories vc ON vcm.category_id = vc.id
-            WHERE vcm.category_id IN (
-                SELECT category_id FROM user_preferences WHERE user_id = ?
-            )
-            ORDER BY (
-                SELECT preference_level FROM user_preferences 
-                WHERE user_id = ? AND category_id = vcm.category_id
-            ) DESC,
-            vc.points DESC
-            LIMIT ?
-        ''', (user_id, user_id, limit))
-        
-        videos = []
-        for row in cursor.fetchall():
-            videos.append({
-                'id': row[0],
-                'title': row[1],
-                'url': row[2],
-                'category': row[3],
-                'points': row[4]
-            })
-        
-        conn.close()
-        return videos
+        # Get videos in the user's preferred categories, ordered by preference
+        with self._lock:
+            cursor = self._conn.execute(_Q_GET_RECS, (user_id, limit))
+            videos = [dict(row) for row in cursor]
+            if videos:
+                return videos
+            
+            # No preferences yet: fall back to the shared top-points list
+            return self._get_default_recommendations()[:limit]
+
+    def _get_default_recommendations(self) -> List[Dict[str, Any]]:
+        """Get the cached cold-start list, refreshing it once it expires."""
+        with self._lock:
+            if time.monotonic() - self._default_recs_at >= DEFAULT_RECS_TTL:
+                try:
+                    cursor = self._conn.execute(_Q_DEFAULT_RECS, (DEFAULT_RECS_SIZE,))
+                    self._default_recs = [dict(row) for row in cursor]
+                    self._default_recs_at = time.monotonic()
+                except sqlite3.Error:
+                    return self._default_recs
+            return self._default_recs
@@ -1,114 +1,190 @@
-from flask import Flask, request, render_template_string, send_from_directory, redirect
+from flask import Flask, Response, request, send_from_directory
 import sqlite3
+import json
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from collections import defaultdict
 
 app = Flask(__name__)
 
 # --- Database setup ---
-conn = sqlite3.connect('botdata.db', check_same_thread=False)
-cursor = conn.cursor()
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS users (
-    user_id INTEGER PRIMARY KEY,
-    credits REAL DEFAULT 0,
-    ton_wallet TEXT,
-    last_daily TEXT,
-    referrer INTEGER
-)
-''')
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS tasks (
-    user_id INTEGER,
-    task_name TEXT,
-    status TEXT,
-    PRIMARY KEY(user_id, task_name)
-)
-''')
-conn.commit()
+DB_PATH = os.getenv('WEBSERVER_DB_PATH', 'botdata.db')
+CREDITS_PER_VIDEO = 0.1
+# Largest id SQLite can store in an INTEGER column
+MAX_USER_ID = 2**63 - 1
+# The watch page is static; let browsers and proxies cache it for an hour
+WATCH_PAGE_MAX_AGE = 3600
+
+# One connection per thread; under WAL, reads on different threads run in parallel
+_tls = threading.local()
+
+def get_db():
+    """Get the calling thread's connection, opening it on first use."""
+    conn = getattr(_tls, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _tls.conn = conn
+    return conn
+
+@app.teardown_appcontext
+def release_db(exc):
+    # Never carry an open transaction into the thread's next request
+    conn = getattr(_tls, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+# user_ids already present in the users table, so add_user can skip the database
+known_users = set()
+
+def init_db():
+    """Create the web tables if they do not exist."""
+    conn = get_db()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            credits REAL DEFAULT 0,
+            ton_wallet TEXT,
+            last_daily TEXT,
+            referrer INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            user_id INTEGER,
+            task_name TEXT,
+            status TEXT,
+            PRIMARY KEY(user_id, task_name)
+        )
+    ''')
+    conn.commit()
+    known_users.update(row[0] for row in conn.execute('SELECT user_id FROM users'))
+
+init_db()
+
+# --- Background task-status writer ---
+TASK_BATCH_SIZE = 100
+TASK_FLUSH_INTERVAL = 0.02  # seconds to wait for more rows before writing
+task_queue = queue.Queue()
+
+def _task_writer():
+    """Write queued task-status rows in batches, one transaction per batch."""
+    conn = get_db()
+    while True:
+        batch = [task_queue.get()]
+        deadline = time.monotonic() + TASK_FLUSH_INTERVAL
+        while len(batch) < TASK_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(task_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO tasks (user_id, task_name, status) VALUES (?, ?, ?)',
+                    batch
+                )
+        except Exception as e:
+            # Log and keep going; a dead writer would silently drop every later row
+            app.logger.error(f"Error writing task statuses: {str(e)}")
+
+threading.Thread(target=_task_writer, name='task-writer', daemon=True).start()
+
+# --- Micro-batched credit increments ---
+CREDIT_FLUSH_INTERVAL = 0.05  # seconds between credit flushes
+CREDIT_FLUSH_TIMEOUT = 5  # seconds a request waits for its flush
+
+class CreditBatch:
+    """Credit deltas collected during one flush window."""
+
+    def __init__(self):
+        self.deltas = defaultdict(float)
+        self.balances = {}
+        self.done = threading.Event()
+
+credit_lock = threading.Lock()
+credit_batch = CreditBatch()
+
+def queue_credits(user_id, amount):
+    """Add a credit delta to the open batch and return that batch."""
+    with credit_lock:
+        credit_batch.deltas[user_id] += amount
+        return credit_batch
+
+def _credit_flusher():
+    """Apply each window's credit deltas and watch completions in one transaction."""
+    global credit_batch
+    conn = get_db()
+    while True:
+        time.sleep(CREDIT_FLUSH_INTERVAL)
+        with credit_lock:
+            batch, credit_batch = credit_batch, CreditBatch()
+        if not batch.deltas:
+            continue
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT INTO users (user_id, credits) VALUES (?, ?) '
+                    'ON CONFLICT(user_id) DO UPDATE SET credits = credits + excluded.credits',
+                    batch.deltas.items()
+                )
+                conn.executemany(
+                    'UPDATE tasks SET status = ? WHERE user_id = ? AND task_name = ?',
+                    [('completed', user_id, 'watch') for user_id in batch.deltas]
+                )
+                balances = {
+                    user_id: conn.execute('SELECT credits FROM users WHERE user_id = ?', (user_id,)).fetchone()[0]
+                    for user_id in batch.deltas
+                }
+            batch.balances = balances
+            known_users.update(batch.deltas)
+        except Exception as e:
+            # Log and keep going; a dead flusher would time out every later request
+            app.logger.error(f"Error flushing credits: {str(e)}")
+        finally:
+            batch.done.set()
+
+threading.Thread(target=_credit_flusher, name='credit-flusher', daemon=True).start()
 
 def add_user(user_id):
-    cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-    if cursor.fetchone() is None:
-        cursor.execute('INSERT INTO users (user_id) VALUES (?)', (user_id,))
-        conn.commit()
+    if user_id in known_users:
+        return
+    db = get_db()
+    db.execute('INSERT INTO users (user_id) VALUES (?) ON CONFLICT(user_id) DO NOTHING', (user_id,))
+    db.commit()
+    known_users.add(user_id)
 
-@app.route('/redirect/<user_id>')
+@app.route(f'/redirect/<int(min=1, max={MAX_USER_ID}):user_id>')
 def redirect_video(user_id):
-    add_user(int(user_id))
-    cursor.execute('INSERT OR REPLACE INTO tasks (user_id, task_name, status) VALUES (?, ?, ?)', 
-                  (int(user_id), 'watch', 'started'))
-    conn.commit()
-    return render_template_string('''
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Watch Video</title>
-    <style>
-        body { font-family: Arial, sans-serif; text-align: center; padding: 20px; }
-        video { width: 100%; max-width: 800px; margin: 20px auto; }
-        #status { margin-top: 20px; }
-    </style>
-</head>
-<body>
-    <h2>Watch this video to earn credits</h2>
-    <video id="video" controls>
-        <source src="https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/BigBuckBunny.mp4" type="video/mp4">
-        Your browser does not support the video tag.
-    </video>
-    <div id="status"></div>
-    <script>
-        const video = document.getElementById('video');
-        const statusDiv = document.getElementById('status');
-        
-        video.onplay = function() {
-            statusDiv.textContent = 'Video is playing...';
-        };
-        
-        video.onended = function() {
-            statusDiv.textContent = 'Video completed! Updating credits...';
-            fetch(`/watched?user_id=${user_id}`)
-                .then(response => response.json())
-                .then(data => {
-                    statusDiv.textContent = data.message;
-                })
-                .catch(err => {
-                    statusDiv.textContent = 'Error: ' + err;
-                });
-        };
-    </script>
-</body>
-</html>
-''')
+    add_user(user_id)
+    task_queue.put((user_id, 'watch', 'started'))
+    return send_from_directory(app.static_folder, 'watch.html', max_age=WATCH_PAGE_MAX_AGE)
+
+# --- Pre-serialized /watched responses ---
+_USER_ID_REQUIRED = json.dumps({'error': 'User ID required'}).encode('utf-8')
+_CREDITS_FAILED = json.dumps({'error': 'Failed to update credits'}).encode('utf-8')
+_CREDITS_UPDATED = '{"message": "Credits updated successfully!", "new_credits": %s}'
+
+def json_response(body, status=200):
+    return Response(body, status=status, mimetype='application/json')
 
 @app.route('/watched')
 def watched():
-    user_id = request.args.get('user_id')
-    if not user_id:
-        return {'error': 'User ID required'}, 400
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None or not 1 <= user_id <= MAX_USER_ID:
+        return json_response(_USER_ID_REQUIRED, 400)
     
-    try:
-        user_id = int(user_id)
-        add_user(user_id)
-        
-        # Update task status
-        cursor.execute('UPDATE tasks SET status = ? WHERE user_id = ? AND task_name = ?', 
-                      ('completed', user_id, 'watch'))
-        
-        # Update credits
-        cursor.execute('SELECT credits FROM users WHERE user_id = ?', (user_id,))
-        current_credits = cursor.fetchone()[0]
-        new_credits = current_credits + 0.1  # 0.1 credits per video
-        cursor.execute('UPDATE users SET credits = ? WHERE user_id = ?', (new_credits, user_id))
-        
-        conn.commit()
-        return {'message': 'Credits updated successfully!', 'new_credits': new_credits}
-    except Exception as e:
-        return {'error': str(e)}, 500
-
-if __name__ == '__main__':
-    app.run(port=8888)
+    # Credits and task completion are written by the next flush; wait for it
+    batch = queue_credits(user_id, CREDITS_PER_VIDEO)
+    if not batch.done.wait(CREDIT_FLUSH_TIMEOUT) or user_id not in batch.balances:
+        return json_response(_CREDITS_FAILED, 500)
+    return json_response(_CREDITS_UPDATED % json.dumps(batch.balances[user_id]))
 
 # --- HTML Page for video ---
 video_page = '''
@@ -136,28 +212,12 @@ video.onended = function() {
 </html>
 '''
 
+_VIDEO_TEMPLATE = app.jinja_env.from_string(video_page)
+
 # --- Route to serve video page ---
-@app.route('/video/<user_id>')
+@app.route(f'/video/<int(min=1, max={MAX_USER_ID}):user_id>')
 def video(user_id):
     add_user(user_id)
-    return render_template_string(video_page, user_id=user_id)
+    return _VIDEO_TEMPLATE.render(user_id=user_id)
 
-# --- Route called after video watched ---
-@app.route('/watched')
-def watched():
-    user_id = request.args.get('user_id')
-    if user_id:
-        add_user(user_id)
-        cursor.execute('UPDATE users SET balance = balance + 10 WHERE user_id = ?', (user_id,))
-        conn.commit()
-        print(f"User {user_id} earned 10 credits!")
-        return "Credits added", 200
-    return "User ID missing", 400
-
-# --- Redirect page to bypass localtunnel password ---
-@app.route('/redirect/<user_id>')
-def redirect_page(user_id):
-    return send_from_directory(os.getcwd(), 'redirect.html')
-
-if __name__ == '__main__':
-    app.run(port=5000)
+# Served through wsgi.py; see DEPLOYMENT.md
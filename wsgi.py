@@ -0,0 +1,5 @@
+"""WSGI entry point for the video web server.
+
+Run with: gunicorn -k gthread --threads 16 wsgi:app
+"""
+from webserver import app